@@ -0,0 +1,168 @@
+from collections import namedtuple
+import inspect
+import time
+import numpy as np
+import pandas as pd
+from cashFlowSchedule import CashFlowSchedule, Recurring, month_ordinal
+from simulationEngines import broadcast_inputs
+
+# order: scenario indices sorted so that shared prefixes are adjacent
+# fork:  per sorted row, the first month whose state differs from the row
+#        before it (0 = nothing shared, n_months = exact duplicate)
+PrefixPlan = namedtuple("PrefixPlan", ["order", "fork"])
+# The same plan in the row order engine.run_forked takes: rows sorted by
+# fork, parent = row the shared months come from (-1 for fork 0)
+ForkPlan = namedtuple("ForkPlan", ["order", "fork", "parent"])
+
+def _hashable(value):
+    # Parameters such as a pd.Series of loan rates cannot be hashed; they
+    # are keyed by identity, so only scenarios passing the same object group.
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ("id", id(value))
+
+
+def describe_scenario(sim, scenario):
+    # Splits a simulate_portfolio keyword dict into the arguments of
+    # base_inputs, a hashable key of those arguments and the full schedule.
+    args = inspect.signature(sim.scenario_inputs).bind(**scenario)
+    args.apply_defaults()
+    args = dict(args.arguments)
+    schedule = CashFlowSchedule.from_dicts(args.pop("investments"), args.pop("house_investments"),
+                                           base=args.pop("schedule"))
+    return args, tuple((name, _hashable(value)) for name, value in args.items()), schedule
+
+
+def _event_month(event):
+    return month_ordinal(event.start if isinstance(event, Recurring) else event.when)
+
+
+def plan_schedules(schedules, months):
+    # Scenarios with equal base inputs only differ in their schedules, and
+    # an event changes nothing before its first month. With every schedule
+    # as its events sorted by first month, sorting the schedules puts long
+    # common prefixes next to each other, and the fork against the row
+    # before is the first month of the first event they disagree on.
+    months = np.asarray(months)
+    events = [sorted((_event_month(e), repr(e)) for e in schedule.events) for schedule in schedules]
+    order = sorted(range(len(schedules)), key=events.__getitem__)
+    fork = np.zeros(len(schedules), dtype=np.int64)
+    for j in range(1, len(order)):
+        a, b = events[order[j - 1]], events[order[j]]
+        k = 0
+        while k < min(len(a), len(b)) and a[k] == b[k]:
+            k += 1
+        first = min([e[0] for e in (a[k:k + 1] + b[k:k + 1])], default=None)
+        # Row 0 is the start state, so every group shares at least that
+        fork[j] = len(months) if first is None else max(1, int(months.searchsorted(first)))
+    return PrefixPlan(np.array(order, dtype=np.int64), fork)
+
+
+def simulated_months(plan, n_months):
+    # Engine steps needed with prefix sharing; without it every scenario
+    # takes n_months - 1.
+    return int(np.where(plan.fork == 0, max(n_months - 1, 0), n_months - plan.fork).sum())
+
+
+def fork_plan(plan):
+    order, fork = plan
+    n_scenarios = len(order)
+    rows = np.arange(n_scenarios)
+
+    # Parent of a forking row: the nearest earlier row that forked before
+    # it; every row in between shares at least as many months.
+    parent = np.full(n_scenarios, -1)
+    for f in np.unique(fork):
+        if f == 0:
+            continue
+        block = rows[fork == f]
+        parent[block] = np.maximum.accumulate(np.where(fork < f, rows, -1))[block - 1]
+
+    by_fork = np.argsort(fork, kind="stable")
+    position = np.empty(n_scenarios, dtype=np.int64)
+    position[by_fork] = rows
+    parent = parent[by_fork]
+    parent = np.where(parent >= 0, position[np.maximum(parent, 0)], -1)
+    return ForkPlan(np.asarray(order)[by_fork], fork[by_fork], parent)
+
+
+def run_shared_prefixes(engine, start_values, gains, decay, cash_in, cash_out, plan):
+    # Same result as engine.run, but each shared prefix is stepped once and
+    # scenarios fork from their neighbour's state at the divergence month,
+    # all in one engine.run_forked call.
+    start_values, inputs = broadcast_inputs(start_values, gains, decay, cash_in, cash_out)
+    order, fork, parent = fork_plan(plan)
+    values = engine.run_forked(start_values[order], *(a[order] for a in inputs), fork, parent)
+    result = np.empty_like(values)
+    result[order] = values
+    return result
+
+
+def simulate_batch(sim, scenarios, share_inputs=True, share_prefixes=True):
+    # Runs a list of simulate_portfolio keyword dicts. Returns the
+    # (portfolio, debt, equity) Series per scenario and statistics.
+    #
+    # Scenarios are grouped by everything except their cash flow schedule.
+    # With share_inputs the market and loan inputs are built once per group
+    # and each scenario only compiles its schedule on top; without it every
+    # scenario goes through scenario_inputs. With share_prefixes the fork
+    # plan from the schedules' event dates goes to engine.run_forked, so
+    # months shared within a group are simulated once.
+    stats = {"scenarios": len(scenarios), "months_naive": 0, "months_simulated": 0, "engine_seconds": 0.0}
+    groups = {}
+    for i, scenario in enumerate(scenarios):
+        args, key, schedule = describe_scenario(sim, scenario)
+        groups.setdefault(key, (args, []))[1].append((i, schedule))
+
+    inputs = [None] * len(scenarios)
+    plans = {}
+    for args, members in groups.values():
+        if share_inputs:
+            base = sim.base_inputs(**args)
+            for i, schedule in members:
+                inputs[i] = sim.with_schedule(base, schedule)
+        else:
+            for i, _ in members:
+                inputs[i] = sim.scenario_inputs(**scenarios[i])
+            base = inputs[members[0][0]]
+        plan = plan_schedules([schedule for _, schedule in members], base.months)
+        plans.setdefault(len(base.timestamps), []).append(
+            PrefixPlan(np.array([members[j][0] for j in plan.order]), plan.fork))
+
+    results = [None] * len(scenarios)
+    for n_months, group_plans in plans.items():
+        # Groups of equal length share the engine call; each group's first
+        # row starts fresh (fork 0).
+        members = np.concatenate([p.order for p in group_plans])
+        plan = PrefixPlan(np.arange(len(members)), np.concatenate([p.fork for p in group_plans]))
+        months_naive = len(members) * max(n_months - 1, 0)
+        months_simulated = simulated_months(plan, n_months)
+        forked = share_prefixes and months_simulated < months_naive
+        if forked:
+            # Stacked straight into run_forked's row order
+            plan = fork_plan(plan)
+            members = members[plan.order]
+        group = [inputs[i] for i in members]
+        arrays = [np.stack([np.broadcast_to(getattr(g, name), n_months) for g in group])
+                  for name in ("gains", "decay", "cash_in", "cash_out")]
+        start_values = np.array([g.start_value for g in group], dtype=float)
+        t0 = time.perf_counter()
+        if forked:
+            values = sim.engine.run_forked(start_values, *arrays, plan.fork, plan.parent)
+        else:
+            values = sim.engine.run(start_values, *arrays)
+            months_simulated = months_naive
+        stats["engine_seconds"] += time.perf_counter() - t0
+        stats["months_simulated"] += months_simulated
+        stats["months_naive"] += months_naive
+
+        for row, (i, g) in enumerate(zip(members, group)):
+            portfolio = pd.Series(values[row], index=g.timestamps, name="Portfolio Value")
+            debt = pd.Series(g.debt, index=g.timestamps, name="Debt Value")
+            equity = pd.Series(values[row] - g.debt, index=g.timestamps, name="Equity Value")
+            results[i] = (portfolio, debt, equity)
+    return results, stats
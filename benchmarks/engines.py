@@ -0,0 +1,52 @@
+# Compare simulation engines on a Monte Carlo sized workload.
+# Run from the repository root:  python -m benchmarks.engines [--scenarios 10000 --months 480]
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulationEngines import available_engines, get_engine
+
+
+def make_workload(n_scenarios, n_months, seed=0):
+    rng = np.random.default_rng(seed)
+    gains = np.exp(rng.normal(0.007, 0.045, size=(n_scenarios, n_months)))
+    inflation = rng.normal(0.0017, 0.003, size=(n_scenarios, n_months))
+    decay = 1 - ((1 + 0.01) ** (1/12) - 1) - inflation
+    cash_in = np.zeros(n_months)
+    cash_out = rng.uniform(0, 15000, size=(n_scenarios, 1)) + 0.0017 * 500000
+    start_values = rng.uniform(5e5, 3e6, size=n_scenarios)
+    return start_values, gains, decay, cash_in, cash_out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", type=int, default=10000)
+    parser.add_argument("--months", type=int, default=480)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workload = make_workload(args.scenarios, args.months)
+    print(f"{args.scenarios} scenarios x {args.months} months")
+    reference = None
+    for name in available_engines():
+        engine = get_engine(name)
+        t0 = time.perf_counter()
+        engine.warm_up()
+        warm = time.perf_counter() - t0
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            values = engine.run(*workload)
+            timings.append(time.perf_counter() - t0)
+        if reference is None:
+            reference = values
+        max_diff = np.max(np.abs(values - reference) / np.maximum(np.abs(reference), 1))
+        print(f"{name:>6}: best {min(timings) * 1e3:8.1f} ms  warm-up {warm * 1e3:8.1f} ms  "
+              f"max rel. diff {max_diff:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Load a fund universe from a local stand-in for the Avanza chart API, with
+# FundUniverse.load's default rate limit unless --rate is given.
+# Run from the repository root:  python -m benchmarks.fund_universe [--funds 500 --latency 0.05 --errors 0.1]
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fundUniverse import FundUniverse
+
+
+def make_handler(latency, error_rate=0.0, n_months=480, requests_seen=None):
+    # error_rate is the share of requests answered with 429 Too Many Requests
+    start_ms = 473385600000  # 1985-01-01
+    month_ms = 30.44 * 24 * 3600 * 1000
+    error_rng = np.random.default_rng(0)
+    lock = threading.Lock()
+
+    class ChartHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            # /_api/fund-guide/chart/<id>/<start>/<end>
+            fund_id = int(self.path.split("/")[4])
+            with lock:
+                if requests_seen is not None:
+                    requests_seen.append(fund_id)
+                failed = error_rng.random() < error_rate
+            if failed:
+                time.sleep(latency)
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            rng = np.random.default_rng(fund_id)
+            prices = 100 * np.cumprod(np.exp(rng.normal(0.006, 0.045, n_months)))
+            body = json.dumps({"dataSerie": [{"x": int(start_ms + i * month_ms), "y": float(p)}
+                                             for i, p in enumerate(prices)]}).encode()
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ChartHandler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--funds", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated server latency in seconds")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=None,
+                        help="requests per second, 0 for unlimited (default: FundUniverse.load's default)")
+    parser.add_argument("--errors", type=float, default=0.0, help="share of requests answered with 429")
+    args = parser.parse_args()
+
+    requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, args.errors,
+                                                                requests_seen=requests_seen))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    fund_ids = list(range(1000, 1000 + args.funds))
+    rate = {} if args.rate is None else {"rate": args.rate}
+
+    try:
+        for workers in (1, args.workers):
+            requests_seen.clear()
+            t0 = time.perf_counter()
+            universe = FundUniverse.load(fund_ids, base_url=base_url, max_workers=workers, **rate)
+            elapsed = time.perf_counter() - t0
+            print(f"{workers:>3} workers: {len(universe.fund_ids)} funds x {len(universe.prices)} months "
+                  f"in {elapsed:.2f} s ({len(universe.errors)} errors, {len(requests_seen)} requests "
+                  f"incl. retries, {len(requests_seen) / elapsed:.0f}/s)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# House-purchase-year x withdrawal-start sweep on synthetic market data (no
+# network needed). The two savings are reported separately:
+#   shared inputs   - market and loan inputs built once for the sweep
+#   shared prefixes - months the scenarios have in common simulated once
+# Engine time is the simulation alone; total time includes building inputs.
+# Run from the repository root:  python -m benchmarks.prefix_sharing [--years 35]
+import argparse
+import os
+import sys
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from portfolioSimulator import PortfolioSimulator
+from cashFlowSchedule import CashFlowSchedule
+from batchPlanner import simulate_batch
+
+
+def synthetic_simulator(first_year=1985, last_year=2025, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(f"{first_year}-01-01", f"{last_year}-12-01", freq="MS", tz="UTC")
+    sim = PortfolioSimulator(None, None, None)
+    sim.price_df = pd.DataFrame({"price": 100 * np.cumprod(np.exp(rng.normal(0.007, 0.045, len(index))))},
+                                index=index)
+    sim.inflation_df = pd.DataFrame({"inflation": rng.normal(0.17, 0.25, len(index))},
+                                    index=index.tz_localize(None))
+    return sim
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start-year", type=int, default=1990)
+    parser.add_argument("--years", type=int, default=35)
+    parser.add_argument("--engine", default=None)
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs per mode")
+    args = parser.parse_args()
+
+    sim = synthetic_simulator()
+    if args.engine:
+        from simulationEngines import get_engine
+        sim.engine = get_engine(args.engine)
+    start = date(args.start_year, 1, 1)
+    end = date(args.start_year + args.years, 1, 1)
+
+    scenarios = []
+    for house_year in range(1, args.years):
+        for withdrawal_year in range(0, args.years, 2):
+            schedule = CashFlowSchedule().monthly(-15000, date(args.start_year + withdrawal_year, 1, 1))
+            scenarios.append(dict(
+                start_value=1500000, loan_value=500000, loan_rate=0.02, start_date=start, end_date=end,
+                house_investments={date(args.start_year + house_year, 1, 1): 1000000},
+                schedule=schedule,
+            ))
+    print(f"{len(scenarios)} scenarios x {args.years * 12} months")
+
+    modes = [("independent", False, False), ("shared inputs", True, False),
+             ("+ shared prefixes", True, True)]
+    timings = {}
+    outputs = {}
+    for label, share_inputs, share_prefixes in modes:
+        runs = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            outputs[label], stats = simulate_batch(sim, scenarios, share_inputs, share_prefixes)
+            runs.append((time.perf_counter() - t0, stats["engine_seconds"]))
+        timings[label] = min(t for t, _ in runs), min(e for _, e in runs)
+        print(f"{label:>17}: {stats['months_simulated']:>8} simulated months "
+              f"({stats['months_simulated'] / stats['months_naive']:.0%} of {stats['months_naive']}), "
+              f"engine {timings[label][1] * 1e3:.1f} ms, total {timings[label][0] * 1e3:.1f} ms")
+
+    print(f"input sharing: {timings['independent'][0] / timings['shared inputs'][0]:.1f}x total time")
+    print(f"prefix sharing: {timings['shared inputs'][1] / timings['+ shared prefixes'][1]:.1f}x engine time")
+    max_diff = max(np.max(np.abs(a[0].to_numpy() - b[0].to_numpy()))
+                   for label, _, _ in modes[1:]
+                   for a, b in zip(outputs["independent"], outputs[label]))
+    print(f"max abs. difference between runs: {max_diff:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+from collections import OrderedDict, namedtuple
+from dataclasses import dataclass
+from datetime import date
+import hashlib
+import threading
+import numpy as np
+
+
+# Dense per-row arrays aligned to the simulation grid:
+#   cash     - added to the portfolio before the monthly return is applied
+#   property - cash moved out of the portfolio into property
+#   debt     - change in loan principal (draws positive, repayments negative)
+CompiledSchedule = namedtuple("CompiledSchedule", ["cash", "property", "debt"])
+
+_COMPILE_CACHE_SIZE = 128
+_compile_cache = OrderedDict()
+# The Flask backend compiles schedules from several request threads
+_compile_cache_lock = threading.Lock()
+
+
+def month_ordinal(d):
+    return d.year * 12 + d.month - 1
+
+
+@dataclass(frozen=True)
+class Recurring:
+    amount: float
+    start: date
+    end: date | None = None
+    every: int = 1
+    growth: float = 0.0
+    indexed: bool = True
+
+
+@dataclass(frozen=True)
+class OneOff:
+    when: date
+    amount: float
+
+
+@dataclass(frozen=True)
+class HousePurchase:
+    when: date
+    amount: float
+
+
+@dataclass(frozen=True)
+class LoanDraw:
+    when: date
+    amount: float
+
+
+@dataclass(frozen=True)
+class LoanRepayment:
+    when: date
+    amount: float
+
+
+class CashFlowSchedule:
+    def __init__(self, events=()):
+        self.events = list(events)
+
+    def monthly(self, amount, start, end=None, growth=0.0, indexed=True, every=1):
+        # Positive amounts are contributions, negative amounts withdrawals.
+        # growth is an annual rate compounded monthly from start (e.g. salary
+        # raises). indexed amounts keep their real value; non-indexed amounts
+        # are nominal and get eroded by inflation.
+        self.events.append(Recurring(float(amount), start, end, int(every), float(growth), bool(indexed)))
+        return self
+
+    def one_off(self, when, amount):
+        self.events.append(OneOff(when, float(amount)))
+        return self
+
+    def house_purchase(self, when, amount):
+        self.events.append(HousePurchase(when, float(amount)))
+        return self
+
+    def loan_draw(self, when, amount):
+        self.events.append(LoanDraw(when, float(amount)))
+        return self
+
+    def loan_repayment(self, when, amount):
+        self.events.append(LoanRepayment(when, float(amount)))
+        return self
+
+    @classmethod
+    def from_dicts(cls, investments=None, house_investments=None, base=None):
+        schedule = cls(base.events if base is not None else ())
+        for when, amount in (investments or {}).items():
+            schedule.one_off(when, amount)
+        for when, amount in (house_investments or {}).items():
+            schedule.house_purchase(when, amount)
+        return schedule
+
+    @classmethod
+    def from_records(cls, records, parse_date=None):
+        if parse_date is None:
+            import pandas as pd
+            parse_date = lambda d: pd.to_datetime(d).date()
+        schedule = cls()
+        for record in records:
+            kind = record.get("type", "one_off")
+            if kind == "monthly":
+                end = record.get("end")
+                schedule.monthly(
+                    record["amount"],
+                    parse_date(record["start"]),
+                    parse_date(end) if end else None,
+                    growth=record.get("growth", 0.0),
+                    indexed=record.get("indexed", True),
+                    every=record.get("every", 1),
+                )
+            elif kind == "one_off":
+                schedule.one_off(parse_date(record["date"]), record["amount"])
+            elif kind == "house_purchase":
+                schedule.house_purchase(parse_date(record["date"]), record["amount"])
+            elif kind == "loan_draw":
+                schedule.loan_draw(parse_date(record["date"]), record["amount"])
+            elif kind == "loan_repayment":
+                schedule.loan_repayment(parse_date(record["date"]), record["amount"])
+            else:
+                raise ValueError(f"Unknown cash flow type: {kind}")
+        return schedule
+
+    def key(self):
+        return hashlib.sha1(repr(tuple(self.events)).encode()).hexdigest()
+
+    def compile(self, months, inflation=None):
+        # months: month ordinals (see month_ordinal) of each simulation row.
+        # inflation: monthly inflation rate per row, used to deflate nominal flows.
+        months = np.asarray(months, dtype=np.int64)
+        if inflation is None:
+            inflation = np.zeros(len(months))
+        inflation = np.asarray(inflation, dtype=float)
+
+        digest = hashlib.sha1(self.key().encode())
+        digest.update(months.tobytes())
+        digest.update(inflation.tobytes())
+        cache_key = digest.hexdigest()
+        with _compile_cache_lock:
+            compiled = _compile_cache.get(cache_key)
+            if compiled is not None:
+                _compile_cache.move_to_end(cache_key)
+                return compiled
+
+        # Compiled outside the lock; two threads racing on the same key just
+        # store equal arrays.
+        compiled = self._compile(months, inflation)
+        with _compile_cache_lock:
+            _compile_cache[cache_key] = compiled
+            _compile_cache.move_to_end(cache_key)
+            if len(_compile_cache) > _COMPILE_CACHE_SIZE:
+                _compile_cache.popitem(last=False)
+        return compiled
+
+    def _compile(self, months, inflation):
+        n = len(months)
+        cash = np.zeros(n)
+        property_flow = np.zeros(n)
+        debt = np.zeros(n)
+        # Real value at row i of one nominal unit, before row i is deflated
+        step = 1 - inflation
+        step[:1] = 1.0
+        deflator = np.concatenate(([1.0], np.cumprod(step)[:-1]))[:n]
+
+        for event in self.events:
+            if isinstance(event, Recurring):
+                k = months - month_ordinal(event.start)
+                active = (k >= 0) & (k % event.every == 0)
+                if event.end is not None:
+                    active &= months <= month_ordinal(event.end)
+                amounts = event.amount * (1 + event.growth) ** (np.maximum(k, 0) / 12)
+                if not event.indexed:
+                    amounts = amounts * deflator
+                cash += np.where(active, amounts, 0.0)
+                continue
+
+            hit = months == month_ordinal(event.when)
+            if isinstance(event, OneOff):
+                cash[hit] += event.amount
+            elif isinstance(event, HousePurchase):
+                cash[hit] -= event.amount
+                property_flow[hit] += event.amount
+            elif isinstance(event, LoanDraw):
+                cash[hit] += event.amount
+                debt[hit] += event.amount
+            elif isinstance(event, LoanRepayment):
+                cash[hit] -= event.amount
+                debt[hit] -= event.amount
+
+        # The first row is the starting state; flows on it are not applied.
+        for arr in (cash, property_flow, debt):
+            if n:
+                arr[0] = 0.0
+            arr.setflags(write=False)
+        return CompiledSchedule(cash, property_flow, debt)
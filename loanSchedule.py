@@ -0,0 +1,146 @@
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import date
+import numpy as np
+
+
+# All arrays are nominal and have months on the last axis. balance is the
+# principal left after each month's payment.
+LoanArrays = namedtuple("LoanArrays", ["payment", "interest", "amortization", "balance"])
+
+AMORTIZATION_KINDS = ("annuity", "straight", "interest_only")
+
+
+def monthly_rate(annual_rate):
+    return (1 + np.asarray(annual_rate, dtype=float)) ** (1/12) - 1
+
+
+def monthly_rate_derivative(annual_rate):
+    return (1 + np.asarray(annual_rate, dtype=float)) ** (-11/12) / 12
+
+
+def load_rate_series(path, date_column="date", rate_column="rate"):
+    # CSV with one annual rate in percent per row, e.g. a historical Stibor
+    # fixing. Returns decimal rates indexed by month start.
+    import pandas as pd
+    df = pd.read_csv(path, parse_dates=[date_column])
+    series = df.set_index(date_column)[rate_column].astype(float) * 0.01
+    series.index = series.index.to_period("M").to_timestamp()
+    return series.groupby(level=0).last().rename("rate")
+
+
+def amortize(principal, monthly_rates, term_months=None, kind="annuity", n_months=None):
+    # Leading axes of principal, term_months and monthly_rates broadcast
+    # against each other, so a sweep over loan terms or rates is one call:
+    #   amortize(1e6, r, np.array([120, 240, 360])[:, None], "annuity", 480)
+    # monthly_rates has months on its last axis (a scalar means a fixed rate).
+    # term_months=None is a perpetual loan; interest-only loans repay the
+    # whole principal with the last payment of the term.
+    if kind not in AMORTIZATION_KINDS:
+        raise ValueError(f"Unknown amortization kind: {kind}")
+    # Complex rates are accepted so that rate derivatives can be taken by
+    # complex-step differentiation (see LoanSpec.rate_sensitivity).
+    rates = np.asarray(monthly_rates)
+    if not np.iscomplexobj(rates):
+        rates = rates.astype(float)
+    if rates.ndim == 0:
+        if n_months is None:
+            raise ValueError("n_months is required with a fixed rate")
+        rates = np.full(n_months, rates)
+    n_months = rates.shape[-1]
+
+    principal = np.asarray(principal, dtype=float)[..., None]
+    term = np.asarray(np.inf if term_months is None else term_months, dtype=float)[..., None]
+    shape = np.broadcast_shapes(principal.shape, term.shape, rates.shape[:-1] + (1,))[:-1] + (n_months,)
+    rates = np.broadcast_to(rates, shape)
+
+    # Payments left including this month's, for months 1..n_months
+    remaining = term - np.arange(n_months)
+    live = remaining > 0
+    finite = np.isfinite(remaining)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if kind == "interest_only":
+            factor = np.where(remaining == 1, 0.0, 1.0)
+        elif kind == "straight":
+            factor = np.where(finite, (remaining - 1) / remaining, 1.0)
+        else:
+            growth = (1 + rates) ** np.where(finite, remaining, 1)
+            factor = np.where(rates == 0,
+                              (remaining - 1) / remaining,
+                              (growth - (1 + rates)) / (growth - 1))
+            factor = np.where(finite, factor, 1.0)
+    factor = np.where(live, factor, 0.0)
+
+    balance = principal * np.cumprod(np.broadcast_to(factor, shape), axis=-1)
+    balance_prev = np.concatenate((np.broadcast_to(principal, shape[:-1] + (1,)), balance[..., :-1]), axis=-1)
+    interest = rates * balance_prev
+    amortization = balance_prev - balance
+    return LoanArrays(interest + amortization, interest, amortization, balance)
+
+
+def loan_sweep(principals, annual_rates, terms, kind="annuity", n_months=360):
+    # Every combination of principal x rate x term in one broadcasted pass;
+    # arrays come back with shape (len(principals), len(annual_rates), len(terms), n_months).
+    principals = np.asarray(principals, dtype=float)[:, None, None]
+    rates = monthly_rate(annual_rates)[None, :, None, None]
+    terms = np.asarray(terms, dtype=float)[None, None, :]
+    rates = np.broadcast_to(rates, rates.shape[:-1] + (n_months,))
+    return amortize(principals, rates, terms, kind)
+
+
+@dataclass(frozen=True)
+class LoanSpec:
+    principal: float
+    rate: object = 0.0          # annual rate, or a pd.Series of annual rates by month
+    term_months: int | None = None
+    kind: str = "interest_only"
+    start: date | None = None   # None means the simulation start
+    margin: float = 0.0         # added to a rate series, e.g. a bank margin over Stibor
+
+    def rate_path(self, month_starts):
+        return monthly_rate(self.annual_rates(month_starts))
+
+    def compile(self, month_starts):
+        return self._compile(month_starts, self.rate_path(month_starts))
+
+    def rate_sensitivity(self, month_starts, step=1e-20):
+        # Derivatives of the compiled arrays with respect to a parallel shift
+        # of the annual rate, exact to rounding via one complex-step pass.
+        annual = self.annual_rates(month_starts)
+        rates = monthly_rate(annual) + 1j * step * monthly_rate_derivative(annual)
+        draw, arrays = self._compile(month_starts, rates)
+        return np.zeros(len(draw)), LoanArrays(*(a.imag / step for a in arrays))
+
+    def annual_rates(self, month_starts):
+        import pandas as pd
+        if isinstance(self.rate, pd.Series):
+            annual = self.rate.reindex(self.rate.index.union(month_starts)).ffill().bfill()
+            annual = annual.reindex(month_starts).to_numpy(dtype=float)
+        else:
+            annual = np.full(len(month_starts), float(self.rate))
+        return annual + self.margin
+
+    def _compile(self, month_starts, rates):
+        # Arrays aligned to the simulation rows. The principal is drawn on
+        # the start row and payments begin on the row after it.
+        import pandas as pd
+        n = len(month_starts)
+        draw = np.zeros(n)
+        payment, interest, amortization, balance = (np.zeros(n, dtype=rates.dtype) for _ in range(4))
+        start = 0
+        if self.start is not None:
+            start = int(pd.DatetimeIndex(month_starts).searchsorted(pd.Timestamp(self.start)))
+        if start >= n or self.principal == 0:
+            return draw, LoanArrays(payment, interest, amortization, balance)
+
+        draw[start] = self.principal
+        balance[start] = self.principal
+        rates = rates[start + 1:]
+        if len(rates):
+            loan = amortize(self.principal, rates, self.term_months, self.kind)
+            payment[start + 1:] = loan.payment
+            interest[start + 1:] = loan.interest
+            amortization[start + 1:] = loan.amortization
+            balance[start + 1:] = loan.balance
+        return draw, LoanArrays(payment, interest, amortization, balance)
@@ -0,0 +1,37 @@
+import numba
+
+
+@numba.njit(parallel=True, cache=True)
+def simulate_paths(start_values, gains, decay, cash_in, cash_out, values):
+    # See simulationEngines for the recurrence; one scenario per prange task.
+    n_scenarios, n_months = values.shape
+    for s in numba.prange(n_scenarios):
+        value = start_values[s]
+        values[s, 0] = value
+        for i in range(1, n_months):
+            value = ((value + cash_in[s, i]) * gains[s, i] - cash_out[s, i]) * decay[s, i]
+            if value < 0:
+                value = 0.0
+            values[s, i] = value
+
+
+@numba.njit(cache=True)
+def simulate_forked(start_values, gains, decay, cash_in, cash_out, fork, parent, values):
+    # Rows are sorted by fork and a row's parent comes before it, so the
+    # parent's path is complete when the row copies its shared months.
+    n_scenarios, n_months = values.shape
+    for s in range(n_scenarios):
+        f = min(fork[s], n_months)
+        if f == 0:
+            value = start_values[s]
+            values[s, 0] = value
+            f = 1
+        else:
+            for i in range(f):
+                values[s, i] = values[parent[s], i]
+            value = values[s, f - 1]
+        for i in range(f, n_months):
+            value = ((value + cash_in[s, i]) * gains[s, i] - cash_out[s, i]) * decay[s, i]
+            if value < 0:
+                value = 0.0
+            values[s, i] = value
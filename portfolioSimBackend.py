@@ -1,41 +1,19 @@
 from flask import Flask, request, jsonify, send_from_directory
 from portfolioSimulator import PortfolioSimulator
-from datetime import date
-import pandas as pd
+from fundUniverse import DEFAULT_FUND_ID, fund_chart_url
+from cashFlowSchedule import CashFlowSchedule
+from simDefaults import SCB_URL, SCB_QUERY, parse_date
 
 app = Flask(__name__)
 
 # Default URLs and query for the simulator
-fund_url = "https://www.avanza.se/_api/fund-guide/chart/1983/1985-01-01/2025-12-31?raw=true"
-scb_url = "https://api.scb.se/OV0104/v1/doris/sv/ssd/START/PR/PR0101/PR0101A/KPItotM"
-scb_query = {
-    "query": [
-        {
-            "code": "ContentsCode",
-            "selection": {
-                "filter": "item",
-                "values": [
-                    "000004VW"
-                ]
-            }
-        }
-    ],
-    "response": {
-        "format": "json"
-    }
-}
+fund_url = fund_chart_url(DEFAULT_FUND_ID)
 
-sim = PortfolioSimulator(fund_url, scb_url, scb_query)
+sim = PortfolioSimulator(fund_url, SCB_URL, SCB_QUERY)
+sim.engine.warm_up()
 sim.fetch_fund_data()
 sim.fetch_inflation_data()
 
-def parse_date(d):
-    if isinstance(d, str):
-        return pd.to_datetime(d).date()
-    if isinstance(d, list) and len(d) == 3:
-        return date(*d)
-    return d
-
 @app.route('/')
 def index():
     return send_from_directory('.', 'index.html')    
@@ -50,7 +28,12 @@ def simulate():
     loan_rate = float(data.get("loan_rate", 0.02))
     isk_rate = float(data.get("isk_rate", 0.01))
     monthly_withdrawal = float(data.get("monthly_withdrawal", 0))
+    amortization = data.get("amortization", "interest_only")
+    loan_term_months = data.get("loan_term_months")
+    if loan_term_months is not None:
+        loan_term_months = int(loan_term_months)
     simulate_inflation = bool(data.get("simulate_inflation", True))
+    sensitivities = bool(data.get("sensitivities", False))
 
     start_date = parse_date(data.get("start_date", "2000-01-01"))
     end_date = data.get("end_date")
@@ -66,8 +49,12 @@ def simulate():
     investments = {parse_date(k): v for k, v in investments.items()}
     house_investments = {parse_date(k): v for k, v in house_investments.items()}
 
+    # Recurring and one-off cash flow rules, e.g.
+    # {"type": "monthly", "amount": -20000, "start": "2005-01-01", "indexed": true}
+    schedule = CashFlowSchedule.from_records(data.get("cash_flows", []), parse_date)
+
     # Run simulation
-    portfolio_value, debt_value, equity_value = sim.simulate_portfolio(
+    sim_data = sim.simulate_portfolio(
         start_value,
         loan_value,
         loan_rate,
@@ -77,8 +64,13 @@ def simulate():
         house_investments,
         isk_rate,
         monthly_withdrawal,
-        simulate_inflation
+        simulate_inflation,
+        schedule,
+        amortization,
+        loan_term_months,
+        sensitivities=sensitivities
     )
+    portfolio_value, debt_value, equity_value = sim_data[:3]
 
     # Prepare response
     result = {
@@ -92,6 +84,18 @@ def simulate():
     metrics = sim.calculate_performance_metrics(equity_value)
     result["metrics"] = metrics
 
+    # Derivatives of the final values per unit change of each parameter
+    # (rates are fractions, so multiply by 0.005 for +0.5 percentage points)
+    if sensitivities:
+        result["sensitivities"] = {
+            name: {
+                "portfolio_value": float(frame["Portfolio Value"].iloc[-1]),
+                "debt_value": float(frame["Debt Value"].iloc[-1]),
+                "equity_value": float(frame["Equity Value"].iloc[-1]),
+            }
+            for name, frame in sim_data[3].items()
+        }
+
     return jsonify(result)
 
 
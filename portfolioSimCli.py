@@ -0,0 +1,107 @@
+# Headless batch runner: reads a scenario book (CSV or JSONL, one scenario
+# per row), simulates it across a process pool and writes the paths and
+# metrics to Parquet or CSV, picked by file extension.
+#
+#   python portfolioSimCli.py scenarios.csv -o results.parquet -m metrics.csv --workers 8
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from portfolioSimulator import PortfolioSimulator
+from fundUniverse import DEFAULT_FUND_ID, fund_chart_url
+from cashFlowSchedule import CashFlowSchedule
+from simDefaults import SCB_URL, SCB_QUERY, parse_date
+
+
+_sim = None
+
+
+def read_scenarios(path):
+    if path.endswith(".jsonl"):
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    df = pd.read_csv(path)
+    return [{k: v for k, v in row.items() if not pd.isna(v)} for row in df.to_dict("records")]
+
+
+def write_table(df, path):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def _init_worker(price_df, inflation_df, engine):
+    global _sim
+    _sim = PortfolioSimulator(None, None, None, engine=engine)
+    _sim.engine.warm_up()
+    _sim.price_df = price_df
+    _sim.inflation_df = inflation_df
+
+
+def run_scenario(args):
+    scenario_id, scenario = args
+    loan_term_months = scenario.get("loan_term_months")
+    schedule = CashFlowSchedule.from_records(scenario.get("cash_flows", []), parse_date)
+    portfolio, debt, equity = _sim.simulate_portfolio(
+        float(scenario.get("start_value", 1500000)),
+        float(scenario.get("loan_value", 500000)),
+        float(scenario.get("loan_rate", 0.02)),
+        parse_date(scenario.get("start_date", "2000-01-01")),
+        parse_date(scenario.get("end_date")),
+        None,
+        {parse_date(k): v for k, v in scenario.get("house_investments", {}).items()},
+        float(scenario.get("isk_rate", 0.01)),
+        float(scenario.get("monthly_withdrawal", 0)),
+        bool(scenario.get("simulate_inflation", True)),
+        schedule,
+        scenario.get("amortization", "interest_only"),
+        int(loan_term_months) if loan_term_months is not None else None,
+    )
+    paths = pd.DataFrame({
+        "scenario": scenario_id,
+        "date": portfolio.index,
+        "portfolio_value": portfolio.to_numpy(),
+        "debt_value": debt.to_numpy(),
+        "equity_value": equity.to_numpy(),
+    })
+    metrics = {"scenario": scenario_id, **_sim.calculate_performance_metrics(equity)}
+    return paths, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a scenario book without the GUI stacks.")
+    parser.add_argument("scenarios", help="scenario file, .csv or .jsonl")
+    parser.add_argument("-o", "--output", help="paths output, .parquet or .csv")
+    parser.add_argument("-m", "--metrics", help="metrics output, .parquet or .csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--engine", default=None, help="simulation engine (numpy, numba or auto)")
+    parser.add_argument("--fund-id", type=int, default=DEFAULT_FUND_ID, help="Avanza fund id")
+    parser.add_argument("--fund-url", default=None, help="overrides --fund-id")
+    args = parser.parse_args()
+
+    scenarios = read_scenarios(args.scenarios)
+    ids = [s.pop("scenario", i) for i, s in enumerate(scenarios)]
+
+    # Fetch the market data once and ship it to every worker
+    sim = PortfolioSimulator(args.fund_url or fund_chart_url(args.fund_id), SCB_URL, SCB_QUERY, engine="numpy")
+    sim.fetch_fund_data()
+    sim.fetch_inflation_data()
+
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                             initargs=(sim.price_df, sim.inflation_df, args.engine)) as pool:
+        chunksize = max(1, len(scenarios) // (4 * (args.workers or 1)))
+        results = list(pool.map(run_scenario, zip(ids, scenarios), chunksize=chunksize))
+
+    metrics = pd.DataFrame([m for _, m in results])
+    if args.output:
+        write_table(pd.concat([p for p, _ in results], ignore_index=True), args.output)
+    if args.metrics:
+        write_table(metrics, args.metrics)
+    if not args.output and not args.metrics:
+        print(metrics.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -153,11 +153,6 @@ class PortfolioSimulatorGUI(QWidget):
         monthly_withdrawal = monthly_cost - monthly_salary
         start_date = f"{start_year}-01-01"
 
-        investments = {
-            "1985-01-01": 0,
-            "2000-01-01": 0,
-            "2001-01-01": 0,
-        }
         if self.buyhouse_year.value() > 0:
             house_investments = {
                 f"{start_year + self.buyhouse_year.value()}-01-01": self.house_cost.value(),
@@ -172,7 +167,6 @@ class PortfolioSimulatorGUI(QWidget):
             "loan_rate": loan_rate,
             "start_date": start_date,
             "end_date": end_date,
-            "investments": investments,
             "house_investments": house_investments,
             "isk_rate": isk_rate,
             "monthly_withdrawal": monthly_withdrawal,
@@ -1,25 +1,36 @@
-from datetime import date
-import requests
-import pandas as pd
-import matplotlib.pyplot as plt
+from collections import namedtuple
+import numpy as np
+from cashFlowSchedule import CashFlowSchedule
+from loanSchedule import LoanSpec, amortize, monthly_rate, monthly_rate_derivative
+from simulationEngines import get_engine
+
+ScenarioInputs = namedtuple("ScenarioInputs", [
+    "timestamps", "month_starts", "months", "inflation", "start_value", "gains", "decay", "cash_in", "cash_out", "debt",
+    "deflator", "deflator_prev", "schedule_debt_prev", "base_loan",
+])
+
+# Parameters simulate_portfolio can differentiate with respect to
+SENSITIVITY_PARAMS = ("start_value", "loan_value", "loan_rate", "isk_rate", "monthly_withdrawal")
 
 
 class PortfolioSimulator:
-    def __init__(self, fund_url, scb_url, scb_query):
+    def __init__(self, fund_url, scb_url, scb_query, engine=None):
         self.fund_url = fund_url
         self.scb_url = scb_url
         self.scb_query = scb_query
         self.price_df = None
         self.inflation_df = None
+        self.engine = get_engine(engine)
 
+    # pandas, requests (via fundUniverse.get_session) and matplotlib are
+    # imported on use, so importing the core only costs numpy.
     def fetch_fund_data(self):
-        response = requests.get(self.fund_url, timeout=2.5)
-        df = pd.DataFrame(response.json()["dataSerie"])
-        df.rename(columns={'x': 'time', 'y': 'price'}, inplace=True)
-        df.set_index(pd.to_datetime(df.pop("time"), unit="ms", utc=True), inplace=True)
-        self.price_df = df
+        from fundUniverse import get_session, parse_chart
+        response = get_session().get(self.fund_url, timeout=2.5)
+        self.price_df = parse_chart(response.json())
 
     def plot_fund_data(self, ax=None):
+        import matplotlib.pyplot as plt
         if self.price_df is not None:
             ax = self.price_df.plot(title="Fund price", ax=ax)
             ax.set_xlabel("date")
@@ -28,7 +39,9 @@ class PortfolioSimulator:
             plt.show(block=False)
 
     def fetch_inflation_data(self):
-        x = requests.post(self.scb_url, json=self.scb_query)
+        import pandas as pd
+        from fundUniverse import get_session
+        x = get_session().post(self.scb_url, json=self.scb_query)
         scb_response = x.json()
         inflation_raw = scb_response['data']
         inflation_list = []
@@ -42,77 +55,217 @@ class PortfolioSimulator:
         self.inflation_df = inflation_df
 
     def plot_inflation_data(self, ax=None):
+        import matplotlib.pyplot as plt
         if self.inflation_df is not None:
             ax = self.inflation_df.plot(title="Inflation Rate", y='inflation', grid=True, ax=ax)
             ax.set_xlabel("date")
             ax.set_ylabel("inflation rate")
             plt.show(block=False)
 
+    def _history_arrays(self, simulate_inflation=True):
+        # Month starts, month-on-month price gains and monthly inflation for
+        # every row of the fund history.
+        equity_price = self.price_df
+        month_starts = equity_price.index.tz_localize(None).to_period("M").to_timestamp()
+        prices = equity_price["price"].to_numpy(dtype=float)
+        gains = prices / np.concatenate((prices[:1], prices[:-1]))
+        if simulate_inflation and self.inflation_df is not None:
+            inflation = 0.01 * self.inflation_df["inflation"].reindex(month_starts).fillna(0).to_numpy(dtype=float)
+        else:
+            inflation = np.zeros(len(equity_price))
+        return month_starts, gains, inflation
+
+    def _simulation_grid(self, start_date=None, end_date=None, simulate_inflation=True):
+        import pandas as pd
+        month_starts, gains, inflation = self._history_arrays(simulate_inflation)
+        mask = np.ones(len(month_starts), dtype=bool)
+        if start_date is not None:
+            mask &= month_starts >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= month_starts <= pd.Timestamp(end_date)
+
+        timestamps = self.price_df.index[mask]
+        month_starts = month_starts[mask]
+        months = (month_starts.year * 12 + month_starts.month - 1).to_numpy()
+        gains = gains[mask]
+        inflation = inflation[mask]
+        # The first row is the starting state and is never stepped.
+        if len(timestamps):
+            gains[0] = 1.0
+            inflation[0] = 0.0
+        return timestamps, month_starts, months, gains, inflation
+
+    def start_rows(self, start_dates):
+        import pandas as pd
+        # Row of the fund history at which each start date begins
+        month_starts, _, _ = self._history_arrays(False)
+        return month_starts.searchsorted(pd.DatetimeIndex(pd.to_datetime(start_dates)))
+
+    def simulate_block(self, start_rows, n_months, start_value, loan_value, loan_rate, isk_rate=0.01,
+                       monthly_withdrawal=0, simulate_inflation=True, amortization="interest_only",
+                       loan_term_months=None):
+        # Vectorized simulate_portfolio without cash flow schedules: every
+        # argument broadcasts to (n_scenarios,), and each scenario runs
+        # n_months from its start row. Returns (portfolio, debt, equity)
+        # arrays of shape (n_scenarios, n_months + 1).
+        _, gains_full, inflation_full = self._history_arrays(simulate_inflation)
+        start_rows, start_value, loan_value, loan_rate, isk_rate, monthly_withdrawal = np.broadcast_arrays(
+            np.atleast_1d(start_rows), start_value, loan_value, loan_rate, isk_rate, monthly_withdrawal)
+        if np.any(start_rows + n_months >= len(gains_full)):
+            raise ValueError("Scenario horizon runs past the end of the fund history")
+
+        rows = start_rows[:, None] + np.arange(n_months + 1)
+        gains = gains_full[rows]
+        inflation = inflation_full[rows]
+        gains[:, 0] = 1.0
+        inflation[:, 0] = 0.0
+
+        deflator = np.cumprod(1 - inflation, axis=1)
+        deflator_prev = np.concatenate((np.ones((len(rows), 1)), deflator[:, :-1]), axis=1)
+        rates = np.broadcast_to(monthly_rate(loan_rate)[:, None], (len(rows), n_months))
+        loan = amortize(loan_value, rates, loan_term_months, amortization)
+        payments = np.concatenate((np.zeros((len(rows), 1)), loan.payment), axis=1)
+        balance = np.concatenate((loan_value[:, None], loan.balance), axis=1)
+
+        isk_rate_monthly = monthly_rate(isk_rate)[:, None]
+        cash_out = monthly_withdrawal[:, None] + payments * deflator_prev
+        decay = 1 - isk_rate_monthly - inflation
+        portfolio = self.engine.run(start_value + loan_value, gains, decay, np.zeros(1), cash_out)
+        debt = balance * deflator
+        return portfolio, debt, portfolio - debt
+
+    def scenario_inputs(self, start_value, loan_value, loan_rate, start_date=None, end_date=None,
+                        investments=None, house_investments=None, isk_rate=0.01,
+                        monthly_withdrawal=0, simulate_inflation=True, schedule=None,
+                        amortization="interest_only", loan_term_months=None, loans=None):
+        # Everything simulate_portfolio feeds to the engine, as arrays aligned
+        # to the simulation rows. The debt path does not depend on the
+        # portfolio, so it is computed here in full.
+        inputs = self.base_inputs(start_value, loan_value, loan_rate, start_date, end_date, isk_rate,
+                                  monthly_withdrawal, simulate_inflation, amortization, loan_term_months, loans)
+        schedule = CashFlowSchedule.from_dicts(investments, house_investments, base=schedule)
+        return self.with_schedule(inputs, schedule)
+
+    def base_inputs(self, start_value, loan_value, loan_rate, start_date=None, end_date=None, isk_rate=0.01,
+                    monthly_withdrawal=0, simulate_inflation=True, amortization="interest_only",
+                    loan_term_months=None, loans=None):
+        # scenario_inputs without a cash flow schedule. This is the pandas-heavy
+        # part; scenarios that only differ in their schedule can share it.
+        timestamps, month_starts, months, gains, inflation = self._simulation_grid(
+            start_date, end_date, simulate_inflation)
+
+        # loan_rate may also be a pd.Series of annual rates (see load_rate_series)
+        base_loan = LoanSpec(loan_value, loan_rate, loan_term_months, amortization)
+        loans = [base_loan] + list(loans or [])
+
+        # Loans are nominal; the simulation runs in start-date money when
+        # inflation is simulated.
+        deflator = np.cumprod(1 - inflation)
+        deflator_prev = np.concatenate(([1.0], deflator[:-1]))
+
+        draws = np.zeros(len(timestamps))
+        payments = np.zeros(len(timestamps))
+        balance = np.zeros(len(timestamps))
+        for loan in loans:
+            draw, arrays = loan.compile(month_starts)
+            draws += draw
+            payments += arrays.payment
+            balance += arrays.balance
+
+        isk_rate_monthly = (1 + isk_rate) ** (1/12) - 1
+        return ScenarioInputs(
+            timestamps=timestamps,
+            month_starts=month_starts,
+            months=months,
+            inflation=inflation,
+            start_value=start_value + balance[:1].sum(),
+            gains=gains,
+            decay=1 - isk_rate_monthly - inflation,
+            cash_in=draws * deflator_prev,
+            cash_out=monthly_withdrawal + payments * deflator_prev,
+            debt=balance * deflator,
+            deflator=deflator,
+            deflator_prev=deflator_prev,
+            schedule_debt_prev=np.zeros(len(timestamps)),
+            base_loan=base_loan,
+        )
+
+    @staticmethod
+    def with_schedule(inputs, schedule):
+        # Adds a cash flow schedule to schedule-free base_inputs.
+        flows = schedule.compile(inputs.months, inputs.inflation)
+        if not flows.debt.any():
+            return inputs._replace(cash_in=inputs.cash_in + flows.cash)
+
+        # Draws and repayments from the cash flow schedule are already in
+        # real terms and accrue interest at the base loan rate.
+        schedule_debt = inputs.deflator * np.cumsum(flows.debt / inputs.deflator_prev)
+        schedule_debt_prev = np.concatenate(([0.0], schedule_debt[:-1]))
+        schedule_interest = inputs.base_loan.rate_path(inputs.month_starts) * schedule_debt_prev
+        return inputs._replace(
+            cash_in=inputs.cash_in + flows.cash,
+            cash_out=inputs.cash_out + schedule_interest,
+            debt=inputs.debt + schedule_debt,
+            schedule_debt_prev=schedule_debt_prev,
+        )
+
     def simulate_portfolio(self, start_value, loan_value, loan_rate, start_date=None, end_date=None,
                            investments=None, house_investments=None, isk_rate=0.01,
-                           monthly_withdrawal=0, simulate_inflation=True):
+                           monthly_withdrawal=0, simulate_inflation=True, schedule=None,
+                           amortization="interest_only", loan_term_months=None, loans=None,
+                           sensitivities=False):
+        # With sensitivities=True a fourth value is returned: a dict mapping
+        # each name in SENSITIVITY_PARAMS to a DataFrame of d(value)/d(param)
+        # for portfolio, debt and equity, carried forward in the same pass.
+        import pandas as pd
 
+        inputs = self.scenario_inputs(start_value, loan_value, loan_rate, start_date, end_date,
+                                      investments, house_investments, isk_rate, monthly_withdrawal,
+                                      simulate_inflation, schedule, amortization, loan_term_months, loans)
+        timestamps, month_starts = inputs.timestamps, inputs.month_starts
+        deflator, deflator_prev = inputs.deflator, inputs.deflator_prev
+        debt_values = inputs.debt
+        if not sensitivities:
+            investment_values = self.engine.run(inputs.start_value, inputs.gains, inputs.decay,
+                                                inputs.cash_in, inputs.cash_out)[0]
+        else:
+            # Loans are linear in the principal, so a unit loan gives the
+            # loan_value tangent; the rate tangent comes from a complex step.
+            _, unit_loan = LoanSpec(1.0, loan_rate, loan_term_months, amortization).compile(month_starts)
+            _, rate_loan = inputs.base_loan.rate_sensitivity(month_starts)
+            d_rate_monthly = monthly_rate_derivative(inputs.base_loan.annual_rates(month_starts))
+            n_params = len(SENSITIVITY_PARAMS)
+            d_start = np.array([1.0, 1.0, 0.0, 0.0, 0.0])
+            d_decay = np.zeros((len(timestamps), n_params))
+            d_decay[:, 3] = -monthly_rate_derivative(isk_rate)
+            d_cash_out = np.zeros((len(timestamps), n_params))
+            d_cash_out[:, 1] = unit_loan.payment * deflator_prev
+            d_cash_out[:, 2] = rate_loan.payment * deflator_prev + d_rate_monthly * inputs.schedule_debt_prev
+            d_cash_out[:, 4] = 1.0
+            d_debt = np.zeros((len(timestamps), n_params))
+            d_debt[:, 1] = unit_loan.balance * deflator
+            d_debt[:, 2] = rate_loan.balance * deflator
 
-        equity_price = self.price_df
-        inflation_df = self.inflation_df
-        investment_value = start_value + loan_value
-        investment_history = []
-        debt_value_history = []
-        equity_value_history = []
-        new_timestamps = []
-        isk_rate_monthly = (1 + isk_rate) ** (1/12) - 1
-        loan_rate_monthly = (1 + loan_rate) ** (1/12) - 1
-        debt_value = loan_value
-        property_value = 0
-
-        first_round = True
-        for timestamp in equity_price.index:
-            curr_date = date(timestamp.year, timestamp.month, 1)
-            if start_date is not None and curr_date < start_date:
-                continue
-            if end_date is not None and curr_date > end_date:
-                break
-            if first_round:
-                investment_history.append(investment_value)
-                debt_value_history.append(debt_value)
-                equity_value_history.append(investment_value - debt_value)
-                new_timestamps.append(timestamp)                
-                first_round = False
-                continue
-
-            year_month_timestamp = pd.Timestamp(curr_date)
-            inflation_rate = 0
-            if simulate_inflation and inflation_df is not None and year_month_timestamp in inflation_df.index:
-                inflation_rate = 0.01 * inflation_df.loc[year_month_timestamp, 'inflation']
-            if investments is not None and curr_date in investments:
-                investment_value += investments[curr_date]
-            if house_investments is not None and curr_date in house_investments:
-                investment_value -= house_investments[curr_date]
-                property_value += house_investments[curr_date]
-            curr_loc = equity_price.index.get_loc(timestamp)
-            if curr_loc > 0:
-                previous_price = equity_price.iloc[curr_loc-1].price
-            else:
-                previous_price = equity_price.iloc[0].price
-            monthly_gain = equity_price.loc[timestamp, "price"] / previous_price
-            
-            investment_value *= monthly_gain
-            investment_value -= monthly_withdrawal
-            investment_value -= loan_value * loan_rate_monthly
-            investment_value *= (1 - isk_rate_monthly - inflation_rate)
-            debt_value *= (1 - inflation_rate)
-            
-            if investment_value < 0:
-                investment_value = 0
-            investment_history.append(investment_value)
-            debt_value_history.append(debt_value)
-            equity_value_history.append(investment_value - debt_value)
-            new_timestamps.append(timestamp)
-
-        portfolio_value = pd.Series(investment_history, index=new_timestamps, name="Portfolio Value")
-        debt_value_series = pd.Series(debt_value_history, index=new_timestamps, name="Debt Value")
-        equity_value_series = pd.Series(equity_value_history, index=new_timestamps, name="Equity Value")
-        return portfolio_value, debt_value_series, equity_value_series
+            investment_values, d_investment = self.engine.run_tangent(
+                inputs.start_value, inputs.gains, inputs.decay, inputs.cash_in, inputs.cash_out,
+                d_start, d_decay, 0.0, d_cash_out)
+            investment_values, d_investment = investment_values[0], d_investment[0]
+
+        portfolio_value = pd.Series(investment_values, index=timestamps, name="Portfolio Value")
+        debt_value_series = pd.Series(debt_values, index=timestamps, name="Debt Value")
+        equity_value_series = pd.Series(investment_values - debt_values, index=timestamps, name="Equity Value")
+        if not sensitivities:
+            return portfolio_value, debt_value_series, equity_value_series
+
+        sensitivity_frames = {
+            name: pd.DataFrame({
+                "Portfolio Value": d_investment[:, i],
+                "Debt Value": d_debt[:, i],
+                "Equity Value": d_investment[:, i] - d_debt[:, i],
+            }, index=timestamps)
+            for i, name in enumerate(SENSITIVITY_PARAMS)
+        }
+        return portfolio_value, debt_value_series, equity_value_series, sensitivity_frames
 
     @staticmethod
     def calculate_performance_metrics(portfolio_series):
@@ -7,34 +7,19 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.pyplot as plt
 from datetime import date
 from portfolioSimulator import PortfolioSimulator
+from fundUniverse import DEFAULT_FUND_ID, fund_chart_url
+from simDefaults import SCB_URL, SCB_QUERY
 import sys
 import numpy as np
 
-fund_url = "https://www.avanza.se/_api/fund-guide/chart/1983/1985-01-01/2025-12-31?raw=true"
-scb_url = "https://api.scb.se/OV0104/v1/doris/sv/ssd/START/PR/PR0101/PR0101A/KPItotM"
-scb_query = {
-    "query": [
-        {
-            "code": "ContentsCode",
-            "selection": {
-                "filter": "item",
-                "values": [
-                    "000004VW"
-                ]
-            }
-        }
-    ],
-    "response": {
-        "format": "json"
-    }
-}
+fund_url = fund_chart_url(DEFAULT_FUND_ID)
 
 class PortfolioSimulatorGUI(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Portfolio Simulator")
         self.resize(1000, 700)
-        self.sim = PortfolioSimulator(fund_url, scb_url, scb_query)
+        self.sim = PortfolioSimulator(fund_url, SCB_URL, SCB_QUERY)
         self.sim.fetch_fund_data()
         self.sim.fetch_inflation_data()
         self.init_ui()
@@ -183,11 +168,6 @@ class PortfolioSimulatorGUI(QWidget):
         monthly_withdrawal = monthly_cost - monthly_salary
         start_date = date(start_year, 1, 1)
 
-        investments = {
-            date(1985, 1, 1): 0,
-            date(2000, 1, 1): 0,
-            date(2001, 1, 1): 0,
-        }
         if self.buyhouse_year.value() > 0:
             house_investments = {
                 date(start_year + self.buyhouse_year.value(), 1, 1): self.house_cost.value(),
@@ -201,7 +181,7 @@ class PortfolioSimulatorGUI(QWidget):
             loan_rate,
             start_date,
             end_date,
-            investments,
+            None,
             house_investments,
             isk_rate,
             monthly_withdrawal,
@@ -0,0 +1,143 @@
+import os
+import numpy as np
+
+
+GRID_AXES = ("start_row", "loan_value", "loan_rate", "monthly_withdrawal", "isk_rate")
+METRIC_NAMES = ("CAGR", "Max Drawdown", "Volatility", "Tot. return")
+RESULT_NAMES = ("portfolio", "debt", "equity")
+
+
+class ScenarioGrid:
+    # Cartesian product of parameter axes. Scenarios are addressed by their
+    # flat index, so no per-scenario objects are ever materialized.
+    def __init__(self, start_rows, loan_values, loan_rates, monthly_withdrawals, isk_rates,
+                 n_months, start_value=1500000, simulate_inflation=True,
+                 amortization="interest_only", loan_term_months=None):
+        self.axes = [np.atleast_1d(np.asarray(a)) for a in
+                     (start_rows, loan_values, loan_rates, monthly_withdrawals, isk_rates)]
+        self.shape = tuple(len(a) for a in self.axes)
+        self.size = int(np.prod(self.shape))
+        self.n_months = n_months
+        self.start_value = start_value
+        self.simulate_inflation = simulate_inflation
+        self.amortization = amortization
+        self.loan_term_months = loan_term_months
+
+    def params(self, lo, hi):
+        index = np.unravel_index(np.arange(lo, hi), self.shape)
+        return {name: axis[i] for name, axis, i in zip(GRID_AXES, self.axes, index)}
+
+    def chunks(self, chunk_size):
+        for lo in range(0, self.size, chunk_size):
+            hi = min(lo + chunk_size, self.size)
+            yield lo, hi, self.params(lo, hi)
+
+
+def horizon_years(sim, start_rows, n_months):
+    # Same year count as calculate_performance_metrics: calendar days between
+    # the first and last row timestamps over 365.25.
+    index = sim.price_df.index
+    start_rows = np.asarray(start_rows)
+    return np.asarray((index[start_rows + n_months] - index[start_rows]).days, dtype=float) / 365.25
+
+
+def chunk_metrics(values, n_years, months_per_year=12):
+    # Vectorized PortfolioSimulator.calculate_performance_metrics over rows;
+    # n_years per row comes from horizon_years.
+    start, end = values[:, 0], values[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        positive = start > 0
+        cagr = np.where(positive, (end / start) ** (1 / n_years) - 1, np.nan)
+        running_max = np.maximum.accumulate(values, axis=1)
+        max_drawdown = np.nanmin((values - running_max) / running_max, axis=1)
+        returns = values[:, 1:] / values[:, :-1] - 1
+        returns[~np.isfinite(returns)] = np.nan
+        volatility = np.nanstd(returns, axis=1, ddof=1) * (months_per_year ** 0.5)
+        total_return = np.where(positive, end / start - 1, np.nan)
+    return np.column_stack((cagr, max_drawdown, volatility, total_return))
+
+
+def iter_grid_results(sim, grid, chunk_size=4096):
+    # Streams (lo, hi, params, portfolio, debt, equity) one block at a time
+    for lo, hi, params in grid.chunks(chunk_size):
+        portfolio, debt, equity = sim.simulate_block(
+            params["start_row"], grid.n_months, grid.start_value, params["loan_value"],
+            params["loan_rate"], params["isk_rate"], params["monthly_withdrawal"],
+            grid.simulate_inflation, grid.amortization, grid.loan_term_months)
+        yield lo, hi, params, portfolio, debt, equity
+
+
+class _NpyWriter:
+    def __init__(self, out_dir, grid, dtype):
+        shape = (grid.size, grid.n_months + 1)
+        self.results = {name: np.lib.format.open_memmap(os.path.join(out_dir, f"{name}.npy"), mode="w+",
+                                                        dtype=dtype, shape=shape)
+                        for name in RESULT_NAMES}
+        self.metrics = np.lib.format.open_memmap(os.path.join(out_dir, "metrics.npy"), mode="w+",
+                                                 dtype=np.float64, shape=(grid.size, len(METRIC_NAMES)))
+
+    def write(self, lo, hi, params, results, metrics):
+        for name, values in zip(RESULT_NAMES, results):
+            self.results[name][lo:hi] = values
+        self.metrics[lo:hi] = metrics
+
+    def close(self):
+        for array in (*self.results.values(), self.metrics):
+            array.flush()
+
+
+class _ParquetWriter:
+    def __init__(self, out_dir, grid, dtype):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required for Parquet output") from None
+        self.pa, self.pq = pa, pq
+        self.out_dir = out_dir
+        self.dtype = dtype
+        self.n_columns = grid.n_months + 1
+        self.part = 0
+
+    def write(self, lo, hi, params, results, metrics):
+        pa = self.pa
+        columns = {"scenario": pa.array(np.arange(lo, hi))}
+        columns.update({name: pa.array(values) for name, values in params.items()})
+        columns.update({name: pa.array(metrics[:, i]) for i, name in enumerate(METRIC_NAMES)})
+        for name, values in zip(RESULT_NAMES, results):
+            flat = pa.array(np.ascontiguousarray(values, dtype=self.dtype).reshape(-1))
+            columns[name] = pa.FixedSizeListArray.from_arrays(flat, self.n_columns)
+        self.pq.write_table(pa.table(columns), os.path.join(self.out_dir, f"part-{self.part:05d}.parquet"))
+        self.part += 1
+
+    def close(self):
+        pass
+
+
+def run_grid(sim, grid, out_dir, chunk_size=4096, dtype=np.float64, fmt="npy"):
+    # Runs the whole grid chunk by chunk and writes portfolio/debt/equity
+    # paths plus per-scenario metrics to out_dir, either as memory-mapped
+    # .npy files (rows in flat scenario order) or one Parquet file per chunk.
+    # Peak memory is bounded by chunk_size, not grid.size. Returns summary
+    # statistics of the metrics over the whole grid.
+    os.makedirs(out_dir, exist_ok=True)
+    writer = {"npy": _NpyWriter, "parquet": _ParquetWriter}[fmt](out_dir, grid, dtype)
+    count = np.zeros(len(METRIC_NAMES))
+    totals = np.zeros(len(METRIC_NAMES))
+    minimum = np.full(len(METRIC_NAMES), np.inf)
+    maximum = np.full(len(METRIC_NAMES), -np.inf)
+    try:
+        for lo, hi, params, portfolio, debt, equity in iter_grid_results(sim, grid, chunk_size):
+            metrics = chunk_metrics(equity, horizon_years(sim, params["start_row"], grid.n_months))
+            writer.write(lo, hi, params, (portfolio, debt, equity), metrics)
+            valid = np.isfinite(metrics)
+            count += valid.sum(axis=0)
+            totals += np.where(valid, metrics, 0).sum(axis=0)
+            minimum = np.minimum(minimum, np.where(valid, metrics, np.inf).min(axis=0))
+            maximum = np.maximum(maximum, np.where(valid, metrics, -np.inf).max(axis=0))
+    finally:
+        writer.close()
+    with np.errstate(invalid="ignore"):
+        mean = totals / count
+    return {name: {"mean": mean[i], "min": minimum[i], "max": maximum[i]}
+            for i, name in enumerate(METRIC_NAMES)}
@@ -0,0 +1,33 @@
+# Defaults shared by the backend, the GUIs and the batch CLI
+from datetime import date
+
+SCB_URL = "https://api.scb.se/OV0104/v1/doris/sv/ssd/START/PR/PR0101/PR0101A/KPItotM"
+SCB_QUERY = {
+    "query": [
+        {
+            "code": "ContentsCode",
+            "selection": {
+                "filter": "item",
+                "values": [
+                    "000004VW"
+                ]
+            }
+        }
+    ],
+    "response": {
+        "format": "json"
+    }
+}
+
+
+def parse_date(d):
+    # Accepts ISO strings, [year, month, day] lists and date objects; empty
+    # values (None, "", NaN from a CSV cell) become None.
+    import pandas as pd
+    if d is None or (isinstance(d, float) and pd.isna(d)) or d == "":
+        return None
+    if isinstance(d, list) and len(d) == 3:
+        return date(*d)
+    if isinstance(d, str):
+        return pd.to_datetime(d).date()
+    return d
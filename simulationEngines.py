@@ -0,0 +1,195 @@
+import importlib.util
+import os
+import numpy as np
+
+# numba takes longer to import than the rest of the core together, so it is
+# only looked up here and imported when a NumbaEngine is created.
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+
+
+# An engine steps the investment recurrence for a block of scenarios:
+#   value[i] = max(0, ((value[i-1] + cash_in[i]) * gains[i] - cash_out[i]) * decay[i])
+# Inputs broadcast to (n_scenarios, n_months); column 0 is the start state.
+# The floor at zero makes it path-dependent, so it cannot be a cumprod.
+#
+# run_forked steps scenarios that share their early months with another
+# one. Rows are sorted by fork. A row j with fork f > 0 equals row parent[j]
+# (an earlier row with a smaller fork) before month f and is only stepped
+# from there; fork 0 starts from the row's own start value.
+
+def broadcast_inputs(start_values, gains, decay, cash_in, cash_out):
+    start_values = np.atleast_1d(np.asarray(start_values, dtype=float))
+    gains, decay, cash_in, cash_out = (np.asarray(a, dtype=float) for a in (gains, decay, cash_in, cash_out))
+    n_months = max(a.shape[-1] for a in (gains, decay, cash_in, cash_out) if a.ndim)
+    shape = np.broadcast_shapes(start_values.shape + (1,), *(a.shape[:-1] + (1,) for a in (gains, decay, cash_in, cash_out) if a.ndim))
+    shape = shape[:-1] + (n_months,)
+    start_values = np.broadcast_to(start_values, shape[:-1])
+    return start_values, [np.broadcast_to(a, shape) for a in (gains, decay, cash_in, cash_out)]
+
+
+class NumpyEngine:
+    name = "numpy"
+
+    def run(self, start_values, gains, decay, cash_in, cash_out):
+        start_values, (gains, decay, cash_in, cash_out) = broadcast_inputs(
+            start_values, gains, decay, cash_in, cash_out)
+        if start_values.size == 1:
+            values = self._run_single(start_values.item(), *(a.reshape(-1) for a in (gains, decay, cash_in, cash_out)))
+            return values.reshape(gains.shape)
+        values = np.empty(gains.shape)
+        if values.shape[-1] == 0:
+            return values
+        value = start_values.copy()
+        values[..., 0] = value
+        for i in range(1, values.shape[-1]):
+            value = ((value + cash_in[..., i]) * gains[..., i] - cash_out[..., i]) * decay[..., i]
+            np.maximum(value, 0, out=value)
+            values[..., i] = value
+        return values
+
+    @staticmethod
+    def _run_single(start_value, gains, decay, cash_in, cash_out):
+        # One scenario: stepping plain floats beats per-month numpy calls.
+        gains, decay = gains.tolist(), decay.tolist()
+        cash_in, cash_out = cash_in.tolist(), cash_out.tolist()
+        values = [0.0] * len(gains)
+        value = float(start_value)
+        if values:
+            values[0] = value
+        for i in range(1, len(gains)):
+            value = ((value + cash_in[i]) * gains[i] - cash_out[i]) * decay[i]
+            if value < 0:
+                value = 0
+            values[i] = value
+        return np.array(values)
+
+    def run_forked(self, start_values, gains, decay, cash_in, cash_out, fork, parent):
+        # One pass over the months; month i only steps the rows whose fork
+        # is <= i, which are a prefix of the block since rows are sorted.
+        start_values, (gains, decay, cash_in, cash_out) = broadcast_inputs(
+            start_values, gains, decay, cash_in, cash_out)
+        values = np.empty(gains.shape)
+        n_months = values.shape[-1]
+        if n_months == 0:
+            return values
+        fork = np.minimum(fork, n_months)
+        active = np.searchsorted(fork, np.arange(n_months), side="right")
+        value = start_values.copy()
+        values[:, 0] = value
+        for i in range(1, n_months):
+            lo, k = active[i - 1], active[i]
+            if k > lo:
+                # Rows forking here continue from their parent's state
+                value[lo:k] = value[parent[lo:k]]
+            step = value[:k] + cash_in[:k, i]
+            step *= gains[:k, i]
+            step -= cash_out[:k, i]
+            step *= decay[:k, i]
+            np.maximum(step, 0, out=step)
+            value[:k] = step
+            values[:k, i] = step
+        # Shared months are copied in fork order, so parents are complete
+        for f in np.unique(fork[fork > 0]):
+            rows = np.flatnonzero(fork == f)
+            values[rows, :f] = values[parent[rows], :f]
+        return values
+
+    def run_tangent(self, start_values, gains, decay, cash_in, cash_out,
+                    d_start, d_decay, d_cash_in, d_cash_out):
+        # Forward-mode derivatives carried alongside the values. The d_*
+        # tangents have one extra trailing axis, one entry per parameter.
+        # Months where the floor at zero binds have zero derivative.
+        start_values, (gains, decay, cash_in, cash_out) = broadcast_inputs(
+            start_values, gains, decay, cash_in, cash_out)
+        n_params = np.shape(d_start)[-1]
+        tangent_shape = gains.shape + (n_params,)
+        d_decay, d_cash_in, d_cash_out = (np.broadcast_to(np.asarray(a, dtype=float), tangent_shape)
+                                          for a in (d_decay, d_cash_in, d_cash_out))
+        values = np.empty(gains.shape)
+        tangents = np.empty(tangent_shape)
+        if values.shape[-1] == 0:
+            return values, tangents
+        value = start_values.copy()
+        tangent = np.broadcast_to(np.asarray(d_start, dtype=float), start_values.shape + (n_params,)).copy()
+        values[..., 0] = value
+        tangents[..., 0, :] = tangent
+        for i in range(1, values.shape[-1]):
+            g, d = gains[..., i, None], decay[..., i, None]
+            pre = (value + cash_in[..., i]) * gains[..., i] - cash_out[..., i]
+            tangent = ((tangent + d_cash_in[..., i, :]) * g - d_cash_out[..., i, :]) * d + pre[..., None] * d_decay[..., i, :]
+            value = pre * decay[..., i]
+            floored = value < 0
+            value[floored] = 0
+            tangent[floored] = 0
+            values[..., i] = value
+            tangents[..., i, :] = tangent
+        return values, tangents
+
+    def warm_up(self):
+        pass
+
+
+class NumbaEngine:
+    name = "numba"
+
+    def __init__(self):
+        if not HAVE_NUMBA:
+            raise ImportError("numba is not installed")
+        from numbaKernels import simulate_forked, simulate_paths
+        self._kernel = simulate_paths
+        self._forked_kernel = simulate_forked
+
+    def run(self, start_values, gains, decay, cash_in, cash_out):
+        start_values, inputs = broadcast_inputs(start_values, gains, decay, cash_in, cash_out)
+        shape = inputs[0].shape
+        values = np.empty(shape)
+        if shape[-1] == 0:
+            return values
+        # Numba compiles one specialization per array layout, so every input
+        # is made C-contiguous: one warm_up() then covers all callers.
+        flat = [np.ascontiguousarray(a.reshape(-1, shape[-1])) for a in inputs]
+        self._kernel(np.ascontiguousarray(start_values.reshape(-1)), *flat, values.reshape(-1, shape[-1]))
+        return values
+
+    def run_forked(self, start_values, gains, decay, cash_in, cash_out, fork, parent):
+        start_values, inputs = broadcast_inputs(start_values, gains, decay, cash_in, cash_out)
+        values = np.empty(inputs[0].shape)
+        if values.shape[-1] == 0:
+            return values
+        self._forked_kernel(np.ascontiguousarray(start_values), *(np.ascontiguousarray(a) for a in inputs),
+                            np.ascontiguousarray(fork, dtype=np.int64),
+                            np.ascontiguousarray(parent, dtype=np.int64), values)
+        return values
+
+    def run_tangent(self, *args):
+        # Sensitivities are a single-scenario, on-request path; the NumPy
+        # implementation is fast enough there.
+        return get_engine("numpy").run_tangent(*args)
+
+    def warm_up(self):
+        # Compiling on first use stalls a request; cache=True also keeps the
+        # machine code on disk for the next process.
+        self.run(np.ones(2), np.ones(2), np.ones(2), np.zeros(2), np.zeros(2))
+        self.run_forked(np.ones(2), np.ones((2, 2)), np.ones((2, 2)), np.zeros((2, 2)), np.zeros((2, 2)),
+                        np.array([0, 1]), np.array([-1, 0]))
+
+
+ENGINES = {"numpy": NumpyEngine, "numba": NumbaEngine}
+_engines = {}
+
+
+def available_engines():
+    return [name for name in ENGINES if name != "numba" or HAVE_NUMBA]
+
+
+def get_engine(name=None):
+    # name=None reads PORTFOLIOSIM_ENGINE and defaults to "auto", which
+    # picks numba when it is installed and numpy otherwise.
+    name = name or os.environ.get("PORTFOLIOSIM_ENGINE", "auto")
+    if name == "auto":
+        name = "numba" if HAVE_NUMBA else "numpy"
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine: {name}")
+    if name not in _engines:
+        _engines[name] = ENGINES[name]()
+    return _engines[name]
@@ -5,30 +5,15 @@ import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime, date
 from portfolioSimulator import PortfolioSimulator
+from fundUniverse import DEFAULT_FUND_ID, fund_chart_url
+from simDefaults import SCB_URL, SCB_QUERY
 
 # Streamlit setup
 st.set_page_config(page_title="Portfolio Simulator", layout="wide")
 st.title("📈 Portfolio Simulator")
 
 # Default URLs and query for fund and inflation data
-FUND_URL = "https://www.avanza.se/_api/fund-guide/chart/1983/1985-01-01/2025-12-31?raw=true"
-SCB_URL = "https://api.scb.se/OV0104/v1/doris/sv/ssd/START/PR/PR0101/PR0101A/KPItotM"
-SCB_QUERY = {
-    "query": [
-        {
-            "code": "ContentsCode",
-            "selection": {
-                "filter": "item",
-                "values": [
-                    "000004VW"
-                ]
-            }
-        }
-    ],
-    "response": {
-        "format": "json"
-    }
-}
+FUND_URL = fund_chart_url(DEFAULT_FUND_ID)
     
 # Inputs
 st.sidebar.header("Input Parameters")